@@ -3,102 +3,106 @@
 # requires-python = ">=3.12"
 # dependencies = [
 #     "click",
-#     "matching",
+#     "pandas",
 #     "rich",
 # ]
 # ///
 
 import csv
+import heapq
+import os
 import sys
-import warnings
-from typing import Dict, List, Any
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
+from typing import Dict, List, Any, Tuple
 import click
-from matching.games import HospitalResident
+import pandas as pd
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from rich import print as rprint
 
-warnings.filterwarnings("ignore", category=UserWarning, module="matching")
-
 console = Console()
 
 
-def load_scribe_preferences(csv_file: str) -> Dict[str, List[str]]:
-    """Load scribe preferences from CSV file."""
-    scribe_prefs = {}
+def _read_ragged_csv(csv_file: str) -> Tuple[pd.DataFrame, List[int]]:
+    """Read a CSV file whose rows may have more or fewer cells than its header.
 
+    The header row is skipped and columns are numbered from 0. A first pass
+    with csv.reader records every data row's real cell count and sizes the
+    frame for the widest row, so pandas never turns extra cells into an
+    index; shorter rows are padded with empty strings. Blank lines are kept
+    as empty rows, so row i of the frame is data row i of the file.
+    """
     with open(csv_file, "r", newline="") as file:
         reader = csv.reader(file)
-        header = next(reader)  # Skip header row
-
-        for row_idx, row in enumerate(reader):
-            if not row or not row[0].strip():  # Skip empty rows
-                continue
-
-            scribe_id = row[0].strip()
-            preferences = []
-
-            # Get preferences from remaining columns (skip empty cells)
-            for pref in row[1:]:
-                if pref and pref.strip():
-                    preferences.append(pref.strip())
-
-            if preferences:  # Only add if scribe has at least one preference
-                scribe_prefs[scribe_id] = preferences
-
-    return scribe_prefs
-
+        next(reader, None)  # Skip header row
+        cell_counts = [len(row) for row in reader]
+
+    if not any(cell_counts):  # No data rows, or only blank ones
+        return pd.DataFrame({0: [""] * len(cell_counts)}, dtype=str), cell_counts
+
+    # pyarrow.csv requires every row to match the column count, even when the
+    # names are given explicitly; pandas pads short rows once the width is known
+    df = pd.read_csv(
+        csv_file,
+        header=None,
+        skiprows=1,
+        names=range(max(cell_counts, default=1)),
+        dtype=str,
+        keep_default_na=False,
+        na_filter=False,
+        skip_blank_lines=False,
+    )
+    return df, cell_counts
 
-def load_lecturer_preferences(csv_file: str) -> Dict[str, List[str]]:
-    """Load lecturer preferences from CSV file."""
-    lecturer_prefs = {}
 
-    with open(csv_file, "r", newline="") as file:
-        reader = csv.reader(file)
-        header = next(reader)  # Skip header row
+@lru_cache(maxsize=8)
+def _load_prefs_cached(path: str, mtime_ns: int) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """Parse a preference CSV file, cached on its path and modification time."""
+    df, _ = _read_ragged_csv(path)
 
-        for row_idx, row in enumerate(reader):
-            if not row or not row[0].strip():  # Skip empty rows
-                continue
+    # Strip whole columns at once, then transpose the preference columns into rows
+    ids, *columns = (df[column].str.strip().tolist() for column in df.columns)
 
-            lecturer_id = row[0].strip()
-            preferences = []
+    prefs = {}
+    for row_id, row in zip(ids, zip(*columns)):
+        row_prefs = tuple(pref for pref in row if pref)  # Skip empty cells
+        if row_id and row_prefs:  # Only add ids with at least one preference
+            prefs[row_id] = row_prefs
 
-            # Get preferences from remaining columns (skip empty cells)
-            for pref in row[1:]:
-                if pref and pref.strip():
-                    preferences.append(pref.strip())
+    return tuple(prefs.items())
 
-            if preferences:  # Only add if lecturer has at least one preference
-                lecturer_prefs[lecturer_id] = preferences
 
-    return lecturer_prefs
+def load_preferences(csv_file: str) -> Dict[str, List[str]]:
+    """Load scribe or lecturer preferences from CSV file."""
+    path = os.path.abspath(csv_file)
+    entries = _load_prefs_cached(path, os.stat(path).st_mtime_ns)
+    return {row_id: list(row_prefs) for row_id, row_prefs in entries}
 
 
 def load_lecturer_quotas(csv_file: str) -> Dict[str, int]:
     """Load lecturer quotas from CSV file."""
-    quotas = {}
-
-    with open(csv_file, "r", newline="") as file:
-        reader = csv.reader(file)
-        header = next(reader)  # Skip header row
-
-        for row_idx, row in enumerate(reader):
-            if not row or len(row) < 2:  # Skip empty or invalid rows
-                continue
-
-            lecturer_name = row[0].strip()
-            try:
-                quota = int(row[1].strip())
-                quotas[lecturer_name] = quota
-            except ValueError:
-                print(
-                    f"Warning: Invalid quota '{row[1]}' for lecturer '{lecturer_name}' on row {row_idx + 2}"
-                )
-                continue
+    df, cell_counts = _read_ragged_csv(csv_file)
+    if df.shape[1] < 2:  # No quota column
+        return {}
+
+    lecturer_names = df[0].str.strip()
+    raw_quotas = df[1]
+    stripped_quotas = raw_quotas.str.strip()
+
+    # Rows with fewer than two cells are skipped; any other quota that is not
+    # a plain integer (including an empty one) is reported
+    has_quota = pd.Series(cell_counts, index=df.index) >= 2
+    valid = has_quota & stripped_quotas.str.fullmatch(r"[+-]?\d+")
+
+    for row_idx in df.index[has_quota & ~valid]:
+        print(
+            f"Warning: Invalid quota '{raw_quotas[row_idx]}' for lecturer '{lecturer_names[row_idx]}' on row {row_idx + 2}"
+        )
 
-    return quotas
+    return dict(zip(lecturer_names[valid], stripped_quotas[valid].astype(int).tolist()))
 
 
 def get_lecturer_quotas() -> Dict[str, int]:
@@ -121,34 +125,79 @@ def get_lecturer_quotas() -> Dict[str, int]:
     return quotas
 
 
-def solve_matching_with_minimum_allocation(
+def _gale_shapley(
     scribe_prefs: Dict[str, List[str]],
-    lecturer_prefs: Dict[str, List[str]],
+    lecturer_rank: Dict[str, Dict[str, int]],
     lecturer_quotas: Dict[str, int],
-    quiet: bool = False,
-) -> Any:
-    """Solve matching using standard Gale-Shapley algorithm."""
-    game = HospitalResident.create_from_dictionaries(
-        scribe_prefs, lecturer_prefs, lecturer_quotas
-    )
-    return game.solve()
+) -> Dict[str, List[str]]:
+    """Scribe-proposing Gale-Shapley with lecturer quotas.
 
+    lecturer_rank maps each lecturer to the rank of every scribe it accepts.
+    Each lecturer keeps its current scribes in a max-heap on that rank, so
+    dropping the worst match on overflow is O(log quota) instead of a scan.
+    """
+    held = {lecturer: [] for lecturer in lecturer_rank}  # Heaps of (-rank, scribe)
+    next_choice = dict.fromkeys(scribe_prefs, 0)
+    free_scribes = list(scribe_prefs)
 
-def create_lecturer_preferences(
-    scribes: List[str], lecturers: List[str]
-) -> Dict[str, List[str]]:
-    """Create uniform lecturer preferences for all scribes."""
-    lecturer_prefs = {}
+    while free_scribes:
+        scribe = free_scribes.pop()
+        prefs = scribe_prefs[scribe]
+
+        while next_choice[scribe] < len(prefs):
+            lecturer = prefs[next_choice[scribe]]
+            next_choice[scribe] += 1
+
+            scribe_rank = lecturer_rank.get(lecturer, {}).get(scribe)
+            if scribe_rank is None:  # Lecturer does not accept this scribe
+                continue
+
+            heapq.heappush(held[lecturer], (-scribe_rank, scribe))
+            if len(held[lecturer]) <= lecturer_quotas[lecturer]:
+                break
 
-    # All lecturers have identical preference lists (all scribes in same order)
-    # The order doesn't matter since they're indifferent, but we need some order
-    all_scribes = sorted(scribes)
+            # Over quota: reject the lecturer's worst current scribe
+            _, rejected = heapq.heappop(held[lecturer])
+            if rejected != scribe:
+                free_scribes.append(rejected)
+                break
 
-    for lecturer in lecturers:
-        # Each lecturer is willing to accept any scribe (uniform preferences)
-        lecturer_prefs[lecturer] = all_scribes.copy()
+    # Matches are listed in the lecturer's order of preference
+    return {
+        lecturer: [scribe for _, scribe in sorted(heap, reverse=True)]
+        for lecturer, heap in held.items()
+    }
 
-    return lecturer_prefs
+
+def solve_matching_with_minimum_allocation(
+    scribe_prefs: Dict[str, List[str]],
+    lecturer_prefs: Dict[str, List[str]],
+    lecturer_quotas: Dict[str, int],
+    quiet: bool = False,
+) -> Any:
+    """Solve matching using standard Gale-Shapley algorithm.
+
+    Lecturers with a quota but no preference list are indifferent between
+    scribes and accept any of them, ties broken by scribe name.
+    """
+    # Only mutually ranked pairs can be matched, so each lecturer's rank table
+    # keeps just the scribes that ranked them, in the lecturer's order
+    scribe_choices = {scribe: set(prefs) for scribe, prefs in scribe_prefs.items()}
+    lecturer_rank = {}
+    for lecturer, prefs in lecturer_prefs.items():
+        accepted = [
+            scribe
+            for scribe in prefs
+            if scribe and lecturer in scribe_choices.get(scribe, ())
+        ]
+        lecturer_rank[lecturer] = {scribe: i for i, scribe in enumerate(accepted)}
+
+    # Indifferent lecturers all share one rank table instead of a full list each
+    uniform_rank = {scribe: i for i, scribe in enumerate(sorted(scribe_prefs))}
+    for lecturer in lecturer_quotas:
+        lecturer_rank.setdefault(lecturer, uniform_rank)
+
+    return _gale_shapley(scribe_prefs, lecturer_rank, lecturer_quotas)
 
 
 def print_matching_results(matching: Any, all_scribes: List[str]):
@@ -167,16 +216,20 @@ def print_matching_results(matching: Any, all_scribes: List[str]):
 
     # The matching object maps lecturers to lists of scribes
     lecturer_assignments = dict(matching)
-    all_matched_scribes = set()
 
-    # Sort lecturers by name and add to table
-    for lecturer in sorted(lecturer_assignments.keys(), key=str):
-        lecturer_name = str(lecturer)
-        assigned_scribes = lecturer_assignments[lecturer]
-        scribe_names = [str(scribe) for scribe in assigned_scribes]
-        all_matched_scribes.update(scribe_names)
+    # Convert names to strings once, then sort scribes in place and lecturers by name
+    rows = [
+        (str(lecturer), [str(scribe) for scribe in assigned_scribes])
+        for lecturer, assigned_scribes in lecturer_assignments.items()
+    ]
+    for _, scribe_names in rows:
+        scribe_names.sort()
+    rows.sort(key=itemgetter(0))
 
-        scribes_str = ", ".join(sorted(scribe_names)) if scribe_names else "None"
+    all_matched_scribes = set(chain.from_iterable(names for _, names in rows))
+
+    for lecturer_name, scribe_names in rows:
+        scribes_str = ", ".join(scribe_names) if scribe_names else "None"
         table.add_row(lecturer_name, scribes_str, str(len(scribe_names)))
 
     console.print(table)
@@ -251,7 +304,7 @@ def main(
             console.print(
                 f"📋 [bold blue]Loading scribe preferences from[/bold blue] [cyan]{scribe_preferences}[/cyan]..."
             )
-        scribe_prefs = load_scribe_preferences(scribe_preferences)
+        scribe_prefs = load_preferences(scribe_preferences)
 
         if not scribe_prefs:
             console.print(
@@ -265,10 +318,7 @@ def main(
             )
 
         # Get all unique lecturers mentioned in scribe preferences
-        all_lecturers = set()
-        for prefs in scribe_prefs.values():
-            all_lecturers.update(prefs)
-        all_lecturers = sorted(list(all_lecturers))
+        all_lecturers = sorted(set().union(*scribe_prefs.values()))
 
         if not quiet:
             console.print(
@@ -296,7 +346,7 @@ def main(
             sys.exit(1)
 
         # Validate that all lecturers have quotas
-        missing_quotas = set(all_lecturers) - set(lecturer_quota_dict.keys())
+        missing_quotas = set(all_lecturers).difference(lecturer_quota_dict)
         if missing_quotas:
             if not quiet:
                 console.print(
@@ -306,18 +356,18 @@ def main(
             for lecturer in missing_quotas:
                 lecturer_quota_dict[lecturer] = 1
 
-        # Load or create lecturer preferences
+        # Load lecturer preferences (lecturers without any are indifferent)
         scribes = list(scribe_prefs.keys())
         if lecturer_preferences:
             if not quiet:
                 console.print(
                     f"👥 [bold blue]Loading lecturer preferences from[/bold blue] [cyan]{lecturer_preferences}[/cyan]..."
                 )
-            lecturer_prefs = load_lecturer_preferences(lecturer_preferences)
+            lecturer_prefs = load_preferences(lecturer_preferences)
 
             # Validate that all lecturers in quotas have preferences
-            missing_lecturer_prefs = set(lecturer_quota_dict.keys()) - set(
-                lecturer_prefs.keys()
+            missing_lecturer_prefs = set(lecturer_quota_dict).difference(
+                lecturer_prefs
             )
             if missing_lecturer_prefs:
                 if not quiet:
@@ -325,20 +375,14 @@ def main(
                         f"⚠️  [yellow]Warning: No preferences found for lecturers:[/yellow] [dim]{', '.join(missing_lecturer_prefs)}[/dim]"
                     )
                     console.print(
-                        "[yellow]Creating uniform preferences for them...[/yellow]"
+                        "[yellow]Using uniform preferences for them...[/yellow]"
                     )
-                uniform_prefs = create_lecturer_preferences(
-                    scribes, list(missing_lecturer_prefs)
-                )
-                lecturer_prefs.update(uniform_prefs)
         else:
             if not quiet:
                 console.print(
-                    "🎲 [yellow]No lecturer preferences file provided. Creating uniform preferences...[/yellow]"
+                    "🎲 [yellow]No lecturer preferences file provided. Using uniform preferences...[/yellow]"
                 )
-            lecturer_prefs = create_lecturer_preferences(
-                scribes, list(lecturer_quota_dict.keys())
-            )
+            lecturer_prefs = {}
 
         # Create and solve the matching game with minimum allocation constraint
         if not quiet:
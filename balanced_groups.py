@@ -2,7 +2,9 @@
 # /// script
 # requires-python = ">=3.12"
 # dependencies = [
+#   "numba",
 #   "numpy",
+#   "orjson",
 # ]
 # ///
 
@@ -13,21 +15,94 @@ Usage: python group_balancer.py participants.txt [options]
 """
 
 import argparse
-import itertools
-import random
 import sys
-from collections import defaultdict, Counter
 from pathlib import Path
-import json
+import numba
 import numpy as np
+import orjson
+
+
+@numba.njit(parallel=True, cache=True)
+def best_arrangement(perms, pair_mat, group_size, bound, num_chunks):
+    """Return (best_score, best_idx) of the lowest-scoring trial below bound
+
+    Each row of perms lists person ids; consecutive group_size chunks form
+    the groups and every pair costs its squared meeting count. Trials are
+    split into num_chunks strided chunks run in parallel, and each chunk
+    stops scoring a trial as soon as it reaches that chunk's incumbent.
+    Ties go to the earliest trial; (bound, -1) is returned when no trial
+    beats bound.
+    """
+    num_trials, n = perms.shape
+    chunk_scores = np.empty(num_chunks, dtype=np.int64)
+    chunk_idx = np.empty(num_chunks, dtype=np.int64)
+    for c in numba.prange(num_chunks):
+        best_score = bound
+        best_idx = -1
+        for t in range(c, num_trials, num_chunks):
+            score = 0
+            for start in range(0, n, group_size):
+                for a in range(start, start + group_size):
+                    for b in range(a + 1, start + group_size):
+                        count = pair_mat[perms[t, a], perms[t, b]]
+                        score += count * count  # Quadratic penalty
+                if score >= best_score:
+                    break  # Cannot beat the incumbent
+            if score < best_score:
+                best_score = score
+                best_idx = t
+        chunk_scores[c] = best_score
+        chunk_idx[c] = best_idx
+
+    # Lowest score wins, ties go to the earliest trial
+    best = 0
+    for c in range(1, num_chunks):
+        if chunk_scores[c] < chunk_scores[best] or (
+                chunk_scores[c] == chunk_scores[best] and chunk_idx[c] < chunk_idx[best]):
+            best = c
+    return chunk_scores[best], chunk_idx[best]
+
+
+def search_arrangements(selected, pair_mat, num_trials, group_size, bound, rng):
+    """Random-restart search over arrangements of the selected person ids
+
+    Only reads pair_mat, so any snapshot of it can be searched; the trials
+    run across CPU threads inside best_arrangement. Returns (best_groups,
+    best_score) with best_groups shaped (num_groups, group_size), or
+    (None, bound) when no trial scores below bound.
+    """
+    perms = np.tile(selected, (num_trials, 1))
+    rng.permuted(perms, axis=1, out=perms)  # Shuffle each row in place, no second copy
+    num_chunks = max(1, min(numba.get_num_threads(), num_trials))
+    best_score, best_idx = best_arrangement(perms, pair_mat, group_size, bound, num_chunks)
+    if best_idx < 0:
+        return None, bound
+    return perms[best_idx].reshape(-1, group_size), int(best_score)
 
 
 class GroupBalancer:
-    def __init__(self, people, group_size=4):
+    def __init__(self, people, group_size=4, seed=None):
         self.people = list(people)
         self.group_size = group_size
-        self.pair_counts = defaultdict(int)
+        self.rng = np.random.default_rng(seed)
         self.session_history = []
+        self._build_pair_matrix()
+        self._build_pair_index()
+
+    def _build_pair_matrix(self, pair_counts=()):
+        """Index people and build the dense pair-count matrix from (a, b, count) entries"""
+        self._name_of = list(self.people)
+        self._id_of = {person: i for i, person in enumerate(self._name_of)}
+        self._id_dtype = np.int16 if len(self._name_of) <= np.iinfo(np.int16).max else np.int32
+        self.pair_mat = np.zeros((len(self._name_of), len(self._name_of)), dtype=np.int32)
+        for a, b, count in pair_counts:
+            if a in self._id_of and b in self._id_of:
+                i, j = self._id_of[a], self._id_of[b]
+                self.pair_mat[i, j] = self.pair_mat[j, i] = count
+
+    def _build_pair_index(self):
+        """Precompute the (i, j) positions of every pair within a group"""
+        self._pair_idx_local = np.column_stack(np.triu_indices(self.group_size, 1))
 
     def generate_session(self, num_groups=None):
         """Generate one session of balanced groups"""
@@ -39,93 +114,118 @@ class GroupBalancer:
             raise ValueError(f"Not enough people ({len(self.people)}) for {num_groups} groups of {self.group_size}")
 
         # Select people for this session (rotate if more people than needed)
+        ids = np.arange(len(self._name_of), dtype=self._id_dtype)
         if len(self.people) > available_count:
             # Rotate starting position to give everyone chances
             start_idx = len(self.session_history) % len(self.people)
-            selected_people = (self.people[start_idx:] + self.people[:start_idx])[:available_count]
+            selected = np.roll(ids, -start_idx)[:available_count]
         else:
-            selected_people = self.people[:available_count]
+            selected = ids[:available_count]
 
-        best_groups = None
-        best_score = float('inf')
+        arrangement = self._rotation_schedule(selected, num_groups)
+        best_score = int(self._calculate_overlap_score(arrangement))
 
-        # Try multiple random arrangements and pick the best one
-        for _ in range(min(1000, len(selected_people) * 50)):
-            shuffled = selected_people.copy()
-            random.shuffle(shuffled)
+        # A rotation without repeated pairs cannot be beaten; otherwise try
+        # multiple random arrangements at once and keep the best one
+        if best_score > 0:
+            num_trials = min(1000, len(selected) * 50)
+            groups, score = search_arrangements(
+                selected, self.pair_mat, num_trials, self.group_size, best_score, self.rng)
+            if groups is not None:
+                arrangement, best_score = groups, score
 
-            groups = [shuffled[i:i+self.group_size]
-                     for i in range(0, len(shuffled), self.group_size)]
-
-            score = self._calculate_overlap_score(groups)
-
-            if score < best_score:
-                best_score = score
-                best_groups = groups
+        best_groups = [[self._name_of[i] for i in group] for group in arrangement]
 
         # Update pair counts
-        for group in best_groups:
-            for pair in itertools.combinations(group, 2):
-                self.pair_counts[tuple(sorted(pair))] += 1
+        pairs = arrangement[:, self._pair_idx_local].reshape(-1, 2)
+        first, second = pairs[:, 0], pairs[:, 1]
+        np.add.at(self.pair_mat, (first, second), 1)
+        np.add.at(self.pair_mat, (second, first), 1)
 
         self.session_history.append({
             'groups': best_groups,
             'score': best_score,
-            'participants': selected_people
+            'participants': [self._name_of[i] for i in selected]
         })
         return best_groups
 
+    def _rotation_schedule(self, selected, num_groups):
+        """Arrange the selected person ids by rotating columns of a fixed grid
+
+        People are laid out row by row on a num_groups x group_size grid; in
+        session s the person in row r, column c joins group (r + s*c) mod
+        num_groups. When num_groups is prime and at least group_size, no pair
+        meets twice within the first num_groups sessions.
+        """
+        session = len(self.session_history)
+        positions = np.arange(len(selected))
+        rows, cols = positions // self.group_size, positions % self.group_size
+        group_of = (rows + session * cols) % num_groups
+        order = np.argsort(group_of, kind='stable')
+        return selected[order].reshape(num_groups, self.group_size)
+
     def _calculate_overlap_score(self, groups):
-        """Calculate penalty score based on existing pair frequencies"""
-        score = 0
-        for group in groups:
-            for pair in itertools.combinations(group, 2):
-                pair_key = tuple(sorted(pair))
-                score += self.pair_counts[pair_key] ** 2  # Quadratic penalty
-        return score
+        """Calculate penalty score based on existing pair frequencies
+
+        groups holds person ids shaped (..., num_groups, group_size);
+        one score is returned per leading index.
+        """
+        pairs = groups[..., self._pair_idx_local]
+        penalties = self.pair_mat[pairs[..., 0], pairs[..., 1]] ** 2  # Quadratic penalty
+        return penalties.sum(axis=(-2, -1))
+
+    def pair_count(self, a, b):
+        """Number of sessions in which a and b were grouped together"""
+        return int(self.pair_mat[self._id_of[a], self._id_of[b]])
 
     def get_pair_statistics(self):
         """Get statistics about pair frequencies"""
-        if not self.pair_counts:
+        frequencies = self.pair_mat[np.triu_indices(len(self.people), 1)]
+        if not frequencies.any():
             return None
 
-        frequencies = list(self.pair_counts.values())
+        values, counts = np.unique(frequencies, return_counts=True)
         return {
-            'total_pairs': len(self.pair_counts),
-            'min_frequency': min(frequencies),
-            'max_frequency': max(frequencies),
-            'mean_frequency': round(np.mean(frequencies), 2),
-            'std_frequency': round(np.std(frequencies), 2),
-            'distribution': dict(Counter(frequencies))
+            'total_pairs': frequencies.size,
+            'min_frequency': int(frequencies.min()),
+            'max_frequency': int(frequencies.max()),
+            'mean_frequency': round(float(frequencies.mean()), 2),
+            'std_frequency': round(float(frequencies.std()), 2),
+            'distribution': dict(zip(values.tolist(), counts.tolist()))
         }
 
     def save_state(self, filename):
         """Save session history to JSON file"""
+        first, second = np.nonzero(np.triu(self.pair_mat, 1))
         state = {
             'people': self.people,
             'group_size': self.group_size,
-            'pair_counts': dict(self.pair_counts),
+            'pair_counts': [[self.people[i], self.people[j], int(self.pair_mat[i, j])]
+                            for i, j in zip(first, second)],
             'session_history': self.session_history
         }
-        with open(filename, 'w') as f:
-            json.dump(state, f, indent=2)
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(state, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
 
     def load_state(self, filename):
         """Load session history from JSON file"""
-        with open(filename, 'r') as f:
-            state = json.load(f)
+        with open(filename, 'rb') as f:
+            state = orjson.loads(f.read())
 
         self.people = state['people']
         self.group_size = state['group_size']
-        self.pair_counts = defaultdict(int, state['pair_counts'])
         self.session_history = state['session_history']
+        self._build_pair_matrix(state['pair_counts'])
+        self._build_pair_index()
 
 
 def load_participants(filename):
     """Load participant names from text file"""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            participants = [line.strip() for line in f if line.strip()]
+        # One name per line; strip() also drops the \r of CRLF line endings
+        with open(filename, 'rb') as f:
+            lines = f.read().decode('utf-8').split('\n')
+        participants = [name for line in lines if (name := line.strip())]
 
         if not participants:
             raise ValueError("No participants found in file")
@@ -169,7 +269,7 @@ def print_statistics(balancer):
 
 def print_overlap_matrix(balancer, max_display=20):
     """Print overlap matrix (limited for readability)"""
-    if not balancer.pair_counts:
+    if not balancer.pair_mat.any():
         print("\nNo overlap data available yet.")
         return
 
@@ -194,8 +294,7 @@ def print_overlap_matrix(balancer, max_display=20):
             if i == j:
                 print(f"{'—':>4}", end="")
             elif i < j:
-                pair_key = tuple(sorted([person1, person2]))
-                count = balancer.pair_counts.get(pair_key, 0)
+                count = balancer.pair_count(person1, person2)
                 print(f"{count:>4}", end="")
             else:
                 print(f"{'':>4}", end="")
@@ -239,10 +338,8 @@ Examples:
                        help='Only output the groups, no headers or stats')
 
     args = parser.parse_args()
-
-    # Set random seed if provided
-    if args.seed:
-        random.seed(args.seed)
+    if args.seed is not None and args.seed < 0:
+        parser.error("--seed must be a non-negative integer")
 
     # Load participants
     participants = load_participants(args.participants_file)
@@ -253,7 +350,7 @@ Examples:
             print(f"Participants: {', '.join(participants)}")
 
     # Initialize balancer
-    balancer = GroupBalancer(participants, args.group_size)
+    balancer = GroupBalancer(participants, args.group_size, args.seed)
 
     # Load previous state if requested
     if args.load_state: